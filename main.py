@@ -25,12 +25,15 @@ TIMEOUT = 15
 # what directory are the seeds stored in?
 SEED_DIR = "seeds"
 
+# how many seed files can we load at once?
+LOAD_THREADS = 8
+
+# how many tickets can be validated in one batch request?
+MAX_BATCH = 256
+
 # how about the HTML templates?
 TEMPLATE_DIR = "templates"
 
-# and where is our scratch hard drive space?
-TMP_DIR = "/tmp"
-
 # beyond this point, you shouldn't have to edit any variables manually
 
 
@@ -38,31 +41,34 @@ TMP_DIR = "/tmp"
 
 from binascii import unhexlify
 
-from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
 
 import errno
 
-from flask import after_this_request, Flask, render_template
-from filelock import Timeout, FileLock
+from functools import lru_cache
+
+from flask import after_this_request, Flask, jsonify, render_template, request
 
 import logging
 
 from math import log, log1p
 
-from os import getenv, strerror
+from os import getenv, listdir, strerror
 
 from secrets import randbits, token_bytes
 
-from time import sleep
+from threading import Lock
+from time import monotonic, sleep, time as timestamp
 from traceback import format_exc
 from typing import Optional
 
 from utils.fsg_seeds import load_seeds, parse_seeds
+from utils.seed_search import contains_seed, contains_seeds
 
-from utils.fsg_ticket import clean_ticket, decode_time, decrypt_bytes
-from utils.fsg_ticket import decrypt_ticket, encode_time, encrypt_bytes
-from utils.fsg_ticket import generate_ticket, hash_bytes, pretty_ticket
-from utils.fsg_ticket import unsigned_to_signed
+import numpy as np
+
+from utils.fsg_ticket import clean_ticket, decode_time_ts, decrypt_ticket, decrypt_tickets_batch
+from utils.fsg_ticket import encode_time_ts, expand_key, generate_ticket, pretty_ticket
 
 
 ##### CLASSES
@@ -79,45 +85,37 @@ class Category:
 
         RAISES
         ======
-        Various I/O exceptions, depending on whether files are where we expect or
-           are writable.
+        Various I/O exceptions, depending on whether the seed file is where we
+           expect.
         """
-        global LD50, SALT, TIMEOUT, TMP_DIR
+        global GEN_SCALE
 
         assert num >= 0      # unsigned only!
 
         self.numeric = num
 
         # load the seed file early so we can signal quickly
-        result = load_seeds( self.seed_file() )
+        result = load_seeds( self.seed_file(), array=True, cache=True )
         if result is None:
             raise FileNotFoundError(errno.ENOENT, strerror(errno.ENOENT), self.seed_file())
-        self.url, self.name, self.seeds = result
-
-        # generate the filenames and locks 
-        gen_lock_file = hash_bytes( f"{num:03d}.generate.lock".encode('utf-8'), SALT ).hex()
-        self.gen_lock = FileLock( f"{TMP_DIR}/{gen_lock_file}", timeout=TIMEOUT )
-        self.gen_file = TMP_DIR + '/' + hash_bytes( f"{num:03d}.generate.file".encode('utf-8'), SALT ).hex()
-
-        ver_lock_file = hash_bytes( f"{num:03d}.verify.lock".encode('utf-8'), SALT ).hex()
-        self.ver_lock = FileLock( f"{TMP_DIR}/{ver_lock_file}", timeout=TIMEOUT )
-        self.ver_file = TMP_DIR + '/' + hash_bytes( f"{num:03d}.verify.file".encode('utf-8'), SALT ).hex()
+        self.url, self.name, self.seeds_u64 = result
 
-        # it'd be wise to try writing to those files before going further
-        now       = encode_time( datetime.now(timezone.utc) )
-        bytecount = (now.bit_length() + 7) >> 3
-        now_b     = encrypt_bytes( now.to_bytes( bytecount, 'big' ), PRIVATE_KEY )
+        # the locks and last access times used for throttling. Flask serves
+        #  from a single process, so these can live in memory.
+        self.gen_lock = Lock()
+        self.next_gen = 0.0      # the earliest time the next ticket may be generated
+        self.ver_lock = Lock()
+        self.next_ver = 0.0      # the earliest time the next verification may finish
 
-        with open( self.gen_file, 'wb' ) as f:      # exceptions are passed up
-            f.write( now_b )
-        with open( self.ver_file, 'wb' ) as f:
-            f.write( now_b )
-
-        self.seed_count = len(self.seeds) >> 3
-        self.seed_bits  = self.seed_count.bit_length()
+        self.seed_count = self.seeds_u64.size
 
         # calculate the generate interval from the number of seeds
-        self.gen    = LD50 * log1p( -1/self.seed_count ) / log( .5 )
+        self.gen    = GEN_SCALE * log1p( -1/self.seed_count )
+
+        # the smallest and largest seeds, as Python ints, for cheaply rejecting
+        #  anything out of range
+        self.seed_lo = int( self.seeds_u64[0] )
+        self.seed_hi = int( self.seeds_u64[-1] )
 
 
     def seed_file(self) -> str:
@@ -126,198 +124,133 @@ class Category:
 
         return f"{SEED_DIR}/{self.numeric:03d}.seeds.gz"
 
-    def generate(self): # -> tuple[bytes,datetime,str]:
+    def generate(self): # -> tuple[bytes,float,str]:
         """Generate a ticket. A smart wrapper around generate_ticket().
 
         RETURN
         ======
-        A tuple of the form (seed, time, ticket), where seed is an int,
-           time is a datetime object, and ticket a string.
+        A tuple of the form (seed, time, ticket), where seed is 8 bytes,
+           time is a POSIX timestamp, and ticket is bytes.
 
         RAISES
         ======
-        Timeout if the lock couldn't be acquired before TIMEOUT.
-        Various I/O errors if the lock or last time generated couldn't
-           be read.
+        TimeoutError if the lock couldn't be acquired, or the next free slot
+           is further than TIMEOUT away.
         """
-        global BLOCKS, PRIVATE_KEY, SALT, TICK
-
-        last = encode_time( datetime.now(timezone.utc) )
-        now  = None     # probably unnecessary
+        global BLOCKS, EXPANDED_KEY, SALT, TIMEOUT
 
                     # acquire lock
-        with self.gen_lock:
+        if not self.gen_lock.acquire( timeout=TIMEOUT ):
+            raise TimeoutError( f"Timed out waiting to generate a ticket in category {self.numeric}." )
 
-                    # read the last access time
-            with open( self.gen_file, 'rb' ) as f:
-                timing = decrypt_bytes( f.read(), PRIVATE_KEY )
+        try:
+            # reserve the next free slot; all that happens under the lock. The
+            #  monotonic clock can't be yanked around by NTP or an admin.
+            now  = monotonic()
+            slot = max( now, self.next_gen )
 
-            if timing is bytes:
-                last = int.from_bytes( timing, 'big' )
+            # never queue further ahead than we'd wait for the lock, or a burst
+            #  of requests could tie up workers for hours
+            if slot - now > TIMEOUT:
+                raise TimeoutError( f"Timed out waiting to generate a ticket in category {self.numeric}." )
 
-            # too quick? sleep
-            now   = datetime.now(timezone.utc)
-            now_e = encode_time( now )
-            delta = (now_e - last)*TICK
+            self.next_gen = slot + self.gen
 
-            if delta < self.gen:
-                sleep( self.gen - delta )
-                now = datetime.now(timezone.utc)
-                now_e = encode_time( now )
+        finally:
+            self.gen_lock.release()     # release lock
 
-            # write the current time
-            with open( self.gen_file, 'wb' ) as f:
-                bytecount = (now_e.bit_length() + 7) >> 3
-                f.write( encrypt_bytes( now_e.to_bytes(bytecount, 'big'), PRIVATE_KEY ) )
+        # too quick? sleep, without holding the lock so others can queue behind us
+        if slot > now:
+            sleep( slot - now )
 
-            # release lock
+        # tickets carry wall-clock time, though
+        now_e = encode_time_ts( timestamp() )
 
-        # randomly pick seed via rejection sampling
-        idx = randbits( self.seed_bits )
-        while idx >= self.seed_count:
-            idx = randbits( self.seed_bits )
-        offset = idx << 3
+        # randomly pick seed
+        seed = self.seeds_u64.item( bounded_randint(self.seed_count) ).to_bytes( 8, 'big' )
 
         # pass to generate_ticket()
-        ticket = generate_ticket( self.seeds[ offset:offset+8 ], self.numeric, \
-                now_e, SALT, PRIVATE_KEY, BLOCKS )
+        ticket = generate_ticket( seed, self.numeric, now_e, SALT, EXPANDED_KEY, BLOCKS )
 
-        return self.seeds[ offset:offset+8 ], now, ticket
+        return seed, decode_time_ts( now_e ), ticket
 
-    def verify_throttle(self):
+    def verify_throttle(self, count: int = 1):
         """Handle the pause associated with verification. Allows external
            code to throttle when its known verification failed.
+
+        PARAMETERS
+        ==========
+        count: How many verifications to pay for. Waiting once for count
+           consecutive slots is the same as calling this count times.
+
+        RAISES
+        ======
+        TimeoutError if the lock couldn't be acquired, or the first slot is
+           further than TIMEOUT away.
         """
-        global PRIVATE_KEY, VERIFY_INT, TICK
+        global VERIFY_INT, TIMEOUT
 
                     # acquire lock
-        with self.ver_lock:
+        if not self.ver_lock.acquire( timeout=TIMEOUT ):
+            raise TimeoutError( f"Timed out waiting to verify a ticket in category {self.numeric}." )
 
-                    # read the last access time
-            with open( self.ver_file, 'rb' ) as f:
-                timing = decrypt_bytes( f.read(), PRIVATE_KEY )
+        try:
+            # reserve the next free slot. A slot is never earlier than now, so
+            #  idle time can't be banked and spent on a later burst.
+            now  = monotonic()
+            slot = max( now, self.next_ver )
 
-            if timing is bytes:
-                last = int.from_bytes( timing, 'big' )
-            else:
-                last = None
+            # never queue further ahead than we'd wait for the lock, or a few
+            #  large batches could delay every other verification for hours. Only
+            #  the wait for our first slot counts, as VERIFY_INT alone can
+            #  exceed TIMEOUT.
+            if slot - now > TIMEOUT:
+                raise TimeoutError( f"Timed out waiting to verify a ticket in category {self.numeric}." )
 
-            # too quick? sleep
-            now   = datetime.now(timezone.utc)
-            now_e = encode_time( now )
-            if last is None:
-                delta = 0
-            else:
-                delta = (now_e - last)*TICK
+            self.next_ver = slot + count*VERIFY_INT
 
-            if delta < VERIFY_INT:
-                sleep( VERIFY_INT - delta )
-                now = encode_time( datetime.now(timezone.utc) )
+        finally:
+            self.ver_lock.release()     # release lock
 
-            # write the current time
-            with open( self.gen_file, 'wb' ) as f:
-                bytecount = (now.bit_length() + 7) >> 3
-                f.write( encrypt_bytes( now.to_bytes(bytecount, 'big'), PRIVATE_KEY ) )
+        # too quick? sleep until our last slot, without holding the lock so others
+        #  can queue behind us
+        slot += (count - 1)*VERIFY_INT
+        if slot > now:
+            sleep( slot - now )
 
-            # release lock
-
-    def verify(self, seed: bytes, cat: int, time: int) -> bool:
-        """Do the remaining verification of a ticket, things that 
-           decrypt_ticket() cannot do.
+    def contains(self, seed: bytes) -> bool:
+        """Check the seed is in this category's archive, the one part of
+           verifying a ticket that decrypt_ticket() cannot do.
 
         PARAMETERS
         ==========
         seed: The Minecraft seed, as a bytes object.
-        cat: The category of the seed.
-        time: 1/8ths of a second since the epoch.
 
         RETURN
         ======
-        True if the ticket is fully verified, False otherwise.
+        True if the seed is in this category, False otherwise.
         """
-        
-        # easy stuff first
-        if cat != self.numeric:
-            return False
 
-        # finally, check the seed is in our archive
-        # check two edge cases
-        if (self.seeds[-8:] < seed) or (self.seeds[:8] > seed):
+        # out of range? Then don't bother the cache or the search
+        key = int.from_bytes( seed, 'big' )
+        if (key < self.seed_lo) or (key > self.seed_hi):
             return False
 
-        # estimate where to find the seed
-        estimate = int( int.from_bytes( seed, 'big' ) * self.seed_count / (1 << 64) )
-        
-        # ensure the estimate is a valid index
-        if estimate >= self.seed_count:
-            estimate = self.seed_count - 1
-        elif estimate < 0:
-            estimate = 0            # should never happen, but branch prediction makes this cheap
-
-        # did we get lucky?
-        offset = estimate << 3
-        if self.seeds[ offset:offset+8 ] == seed:
-            return True
-
-        # too low? set that location to be left, scan for right
-        if self.seeds[ offset:offset+8 ] < seed:
-            left = estimate
-            step = 1
-            right = estimate + step
-
-            while right < self.seed_count:
-                offset = right << 3
-                if self.seeds[ offset:offset+8 ] < seed:
-                    step <<= 1
-                    right += step
-                elif self.seeds[ offset:offset+8 ] == seed:
-                    return True
-                else:
-                    break
-
-            if right >= self.seed_count:
-                right = self.seed_count - 1
-
-        # too high? set that location to be right, scan for left
-        else:
-            right = estimate
-            step = 1
-            left = estimate - step
-
-            while left > 0:
-                offset = left << 3
-                if self.seeds[ offset:offset+8 ] > seed:
-                    step <<= 1
-                    left -= step
-                elif self.seeds[ offset:offset+8 ] == seed:
-                    return True
-                else:
-                    break
-
-            if left < 0:
-                left = 0
-
-        # binary search, but only up to a limit
-        while (right - left) > 8:          # TODO: what limit is optimal?
-
-            middle = (left + right) >> 1
-            offset = middle << 3
-
-            if self.seeds[ offset:offset+8 ] == seed:
-                return True
-            elif self.seeds[ offset:offset+8 ] < seed:
-                left = middle
-            else:
-                right = middle
-
-        # within the limit? Linear scan
-        for idx in range(left,right+1):
-            offset = idx << 3
-            if self.seeds[ offset:offset+8 ] == seed:
-                return True
-
-        # still not found? It's not on the list
-        return False
+        return seed_in_category( self.numeric, key )
+
+    def contains_many(self, seeds: np.ndarray) -> np.ndarray:
+        """Check which of many seeds belong to this category.
+
+        PARAMETERS
+        ==========
+        seeds: A numpy array of uint64s, each a seed in unsigned form.
+
+        RETURN
+        ======
+        A numpy array of bools, True where the seed is in this category.
+        """
+
+        return contains_seeds( self.seeds_u64, seeds )
 
 
 ##### METHODS
@@ -357,6 +290,112 @@ def get_salt(): # -> tuple[bytes,bool]:
 
     return token_bytes(64), True
 
+@lru_cache( maxsize=256 )
+def seed_in_category( num: int, seed: int ) -> bool:
+    """Check if a seed is in the given category's archive. Validators tend to
+       retry the same seed, so recent answers are remembered. If the seeds of
+       a category are ever reloaded, call seed_in_category.cache_clear().
+
+    PARAMETERS
+    ==========
+    num: The category's number.
+    seed: The Minecraft seed, as an unsigned int.
+
+    RETURN
+    ======
+    True if the seed is in that category, False otherwise.
+    """
+
+    return contains_seed( cat_map[num].seeds_u64, seed )
+
+def load_category( num: int ) -> Optional[Category]:
+    """Try to create the given Category, for use by a thread pool.
+
+    PARAMETERS
+    ==========
+    num: The category's number.
+
+    RETURN
+    ======
+    The Category, or None if it couldn't be loaded.
+    """
+
+    try:
+        return Category(num)
+    except:
+        # print( f"DEBUG: Exception encountered: {format_exc()}" )
+        return None
+
+def bounded_randint( n: int ) -> int:
+    """Pick a random integer from [0,n) without bias, via Lemire's multiply-high
+       method. One 64-bit draw almost always suffices, rather than the two we
+       expect on average from plain rejection sampling.
+
+    PARAMETERS
+    ==========
+    n: The upper bound, exclusive. Must be between 1 and 2^64.
+
+    RETURN
+    ======
+    The random integer.
+    """
+
+    assert (n > 0) and (n <= (1 << 64))
+
+    product = randbits( 64 ) * n
+    low     = product & ((1 << 64) - 1)
+    if low < n:
+
+        # rare case: reject the draws that would bias the result
+        threshold = (1 << 64) % n
+        while low < threshold:
+            product = randbits( 64 ) * n
+            low     = product & ((1 << 64) - 1)
+
+    return product >> 64
+
+def alias_table( weights ): # -> tuple[list,list]:
+    """Build an alias table (Walker's method, Vose's construction) for picking
+       an index with probability proportional to its weight. Integer arithmetic
+       keeps the probabilities exact.
+
+    PARAMETERS
+    ==========
+    weights: A list of positive integers.
+
+    RETURN
+    ======
+    A tuple of the form (thresh, alias). To sample, pick a column uniformly
+       from [0,len(weights)) and a value uniformly from [0,sum(weights)); if
+       the value is below thresh[column] the result is column, otherwise it is
+       alias[column].
+    """
+
+    count  = len(weights)
+    total  = sum(weights)
+    scaled = [weight*count for weight in weights]     # every column holds total
+
+    thresh = [total] * count
+    alias  = list( range(count) )
+
+    small = [i for i,weight in enumerate(scaled) if weight < total]
+    large = [i for i,weight in enumerate(scaled) if weight >= total]
+    while small and large:
+
+        # fill the rest of an underfull column with an overfull one
+        lo = small.pop()
+        hi = large.pop()
+        thresh[lo] = scaled[lo]
+        alias[lo]  = hi
+
+        scaled[hi] -= total - scaled[lo]
+        if scaled[hi] < total:
+            small.append( hi )
+        else:
+            large.append( hi )
+
+    return thresh, alias
+
 def discourage_caching(r):
     """Add a few headers to tell the web browser *not* to cache pages. With the cache
         enabled, some of the javascript breaks during navigation.
@@ -370,29 +409,34 @@ def discourage_caching(r):
 
 assert BLOCKS in [1,2]
 
-BOOT = int(datetime.now(timezone.utc).timestamp())
+BOOT = int(timestamp())
 
 TICK = 0.125
 INVTICK = 8
 
+GEN_SCALE   = LD50 / log( .5 )                     # the fixed parts of the generate
+FORGE_SCALE = DEAD_TIME / log1p( -FORGE_SUCCESS )  #  and verify intervals
+
 PRIVATE_KEY, RANDOM_KEY = get_key()
+EXPANDED_KEY            = expand_key( PRIVATE_KEY )
 SALT, RANDOM_SALT       = get_salt()
 
-url_map  = dict()        # for mapping between url names and category numbers
+url_map  = dict()        # for mapping between url names and classes
 cat_map  = dict()        # for mapping between category numbers and classes
 cat_list = list()        # (url,name) tuples for printing at the bottom of pages
 
 seed_total = 0           # used for picking a random category, weighted by seed count
-seed_bits  = 0
 seed_list  = list()
+seed_thresh = list()     # an alias table over seed_list, for picking a category in constant time
+seed_alias  = list()
 
 validator = None         # use this Category to handle validation throttling
 
 # the verify interval is identical for all categories
 if BLOCKS == 2:
-    VERIFY_INT = DEAD_TIME * log1p( -1/(1 << (19*8)) ) / log1p( -FORGE_SUCCESS )
+    VERIFY_INT = FORGE_SCALE * log1p( -1/(1 << (19*8)) )
 else:
-    VERIFY_INT = DEAD_TIME * log1p( -1/(1 << (3*8)) ) / log1p( -FORGE_SUCCESS )
+    VERIFY_INT = FORGE_SCALE * log1p( -1/(1 << (3*8)) )
 
 logging.basicConfig( level=logging.INFO, format='%(asctime)s - %(module)s - %(levelname)s - %(message)s' )
 
@@ -401,6 +445,10 @@ logging.basicConfig( level=logging.INFO, format='%(asctime)s - %(module)s - %(le
 # init the web framework, so we can start logging
 site = Flask(__name__)
 
+# a [seed, ticket] pair fits comfortably in 256 bytes of JSON, so refuse bigger
+#  bodies before Flask spends time parsing them
+site.config['MAX_CONTENT_LENGTH'] = MAX_BATCH * 256
+
 site.logger.info(  "Initialized Flask." )
 site.logger.info( f"LIVE_TIME = {LIVE_TIME}." )
 site.logger.info( f"DEAD_TIME = {DEAD_TIME}." )
@@ -422,18 +470,25 @@ else:
 
 site.logger.info(  "Loading seeds." )
 
-# load up and register the seeds
-for idx in range(256):
+# list the seed directory once, rather than trying to open all 256 possible files
+try:
+    seed_files = set( listdir(SEED_DIR) )
+except OSError:
+    seed_files = set()
 
-    temp = None
-    try:
-        temp = Category(idx)
-    except:
-        # print( f"DEBUG: Exception encountered: {format_exc()}" )
+# load the seeds in parallel; gzip decompression releases the GIL
+numbers = [idx for idx in range(256) if f"{idx:03d}.seeds.gz" in seed_files]
+with ThreadPoolExecutor( max_workers=LOAD_THREADS ) as pool:
+    loaded = list( pool.map( load_category, numbers ) )
+
+# register them in order
+for idx, temp in zip( numbers, loaded ):
+
+    if temp is None:
         continue        # no point carrying on
 
     cat_map[ idx ]      = temp
-    url_map[ temp.url ] = idx
+    url_map[ temp.url ] = temp
     cat_list.append( (temp.url,temp.name) )
 
     seed_list.append( (temp.seed_count + seed_total, idx) )
@@ -445,7 +500,7 @@ for idx in range(256):
     site.logger.info(  f"Loaded {temp.seed_count} seeds in category '{temp.url}'." )
 
 site.logger.info( f"Loaded {seed_total} total seeds in {len(cat_map)} categories." )
-seed_bits = seed_total.bit_length()
+seed_thresh, seed_alias = alias_table( [cat_map[idx].seed_count for _,idx in seed_list] )
 
 
 @site.route('/')
@@ -466,7 +521,7 @@ def current_time():
         return discourage_caching(response)
 
     # display the server's current time
-    return render_template( 'time.html', time=int(datetime.now(timezone.utc).timestamp()), uptime=BOOT )
+    return render_template( 'time.html', time=int(timestamp()), uptime=BOOT )
 
 @site.route('/generate/', defaults={'cat': None})
 @site.route('/generate/<cat>')
@@ -476,55 +531,60 @@ def create_ticket(cat):
     def add_header(response):
         return discourage_caching(response)
 
-    if not( cat in url_map ):
-        # pick a random seed
-        idx = randbits( seed_bits )
-        while idx >= seed_total:
-            idx = randbits( seed_bits )
+    category = url_map.get( cat )
+    if category is None:
+        # pick a random category, weighted by seed count: a column of the
+        #  alias table, then either that column's category or its alias
+        col, idx = divmod( bounded_randint( len(seed_list)*seed_total ), seed_total )
+        pos = col if idx < seed_thresh[col] else seed_alias[col]
+        category = cat_map[ seed_list[pos][1] ]
 
-        # figure out which category this seed is in
-        if idx < seed_list[0][0]:
-            cat = cat_list[0][0]
-        else:
-            left = 0
-            right = len(seed_list)-1
-            while (right - left) > 8:
-                middle = (left + right) >> 1
-                if seed_list[middle][0] > idx:
-                    right = middle
-                else:
-                    left = middle
-            for i in range(left,right+1):
-                if idx < seed_list[i][0]:
-                    cat = cat_list[i][0]
-                    break
-            else:
-                cat = cat_list[right][0]
-
-    num = url_map[cat]
     try:
-        output = cat_map[num].generate()
+        output = category.generate()
     except:
         site.logger.error(f"Exception when generating a ticket: {format_exc()}" )
         return render_template( 'error.html' )
 
     seed, time, ticket = output
-    seed_i = unsigned_to_signed( int.from_bytes(seed,'big') )
+    seed_i = int.from_bytes( seed, 'big', signed=True )
     ticket_p = pretty_ticket(ticket)
 
-    site.logger.info(f"Created ticket {ticket_p} for category '{cat}' and seed {seed_i}" )
+    site.logger.info(f"Created ticket {ticket_p} for category '{category.url}' and seed {seed_i}" )
 
-    return render_template( 'generated.html', seed=seed_i, name=cat_map[num].name, time=LIVE_TIME, \
+    return render_template( 'generated.html', seed=seed_i, name=category.name, time=LIVE_TIME, \
             ticket=ticket_p, cats=cat_list )
 
 @site.route('/validate/<seed>/<ticket>')
 def validate(seed, ticket):
-    global PRIVATE_KEY, SALT, TICK
 
     @after_this_request
     def add_header(response):
         return discourage_caching(response)
 
+    try:
+        return check_ticket( seed, ticket )
+    except TimeoutError:
+        site.logger.error(f"Exception when validating a ticket: {format_exc()}" )
+        return render_template( 'error.html' )
+
+def check_ticket(seed, ticket):
+    """Validate a ticket and render the result. The guts of validate().
+
+    PARAMETERS
+    ==========
+    seed: The seed from the URL, as a string.
+    ticket: The ticket from the URL, as a string.
+
+    RETURN
+    ======
+    The rendered page.
+
+    RAISES
+    ======
+    TimeoutError if the validation throttle is backed up.
+    """
+    global EXPANDED_KEY, SALT, TICK
+
     # defer on throttling; if we take <1/8th of a second to validate in all scenarios,
     #  then throttling just before any exit removes a side-channel attack.
 
@@ -541,7 +601,7 @@ def validate(seed, ticket):
         validator.verify_throttle()
         return render_template( 'invalid_expired.html', cats=cat_list )
 
-    seed_b = (seed_i & ((1 << 64) - 1)).to_bytes( 8, 'big' )
+    seed_b = seed_i.to_bytes( 8, 'big', signed=True )
 
     # time to check the ticket format
     ticket_b = clean_ticket( ticket )
@@ -551,38 +611,134 @@ def validate(seed, ticket):
         return render_template( 'invalid_expired.html', cats=cat_list )
 
     # next up, decrypt the ticket
-    results = decrypt_ticket( seed_b, ticket_b, PRIVATE_KEY, SALT )
+    results = decrypt_ticket( seed_b, ticket_b, EXPANDED_KEY, SALT )
     if results is None:
         site.logger.warning(f"Asked to validate an invalid ticket for seed {seed_i}." )
         validator.verify_throttle()
         return render_template( 'invalid_expired.html', cats=cat_list )
 
+    # the ticket names the category, so no need to check it matches
     seed_n, cat, time = results
-    if not cat_map[cat].verify( seed_b, cat, time ):
+    category = cat_map.get( cat )
+    if (category is None) or not category.contains( seed_b ):
         site.logger.warning(f"Secondary validation failed for seed {seed_i} and ticket {ticket}." )
         validator.verify_throttle()
         return render_template( 'invalid_expired.html', cats=cat_list )
 
     # ah, but how much time has elapsed?
-    now = datetime.now(timezone.utc)
-    now_e = encode_time( now )
-    delta  = (now_e - time)*TICK
+    now_e = encode_time_ts( timestamp() )
+    delta = (now_e - time)*TICK
     if delta < LIVE_TIME:
         validator.verify_throttle()
         return render_template( 'live.html', seed=seed_i, time=int(LIVE_TIME - delta + .5), \
-                name=cat_map[cat].name, cats=cat_list )
+                name=category.name, cats=cat_list )
 
     elif delta < DEAD_TIME:
-        time_d    = decode_time( time )
-        dtime     = (time_d + timedelta(seconds=LIVE_TIME))
-        dtime_utc = datetime( dtime.year, dtime.month, dtime.day, dtime.hour, dtime.minute, \
-                tzinfo=timezone.utc )
+        # when it died, rounded down to the minute
+        dtime = decode_time_ts( time ) + LIVE_TIME
         validator.verify_throttle()
-        return render_template( 'dead.html', time=dtime_utc.timestamp(), name=cat_map[cat].name, cats=cat_list )
+        return render_template( 'dead.html', time=dtime - dtime % 60, name=category.name, cats=cat_list )
 
     validator.verify_throttle()
     return render_template( 'invalid_expired.html', cats=cat_list )
 
+@site.route('/validate_batch', methods=['POST'])
+def validate_batch():
+    global EXPANDED_KEY, MAX_BATCH, SALT, TICK
+
+    @after_this_request
+    def add_header(response):
+        return discourage_caching(response)
+
+    # expect a JSON list of [seed, ticket] pairs. Every ticket pays for its own
+    #  throttle slot, so batching can't speed up a brute-force attempt.
+    pairs = request.get_json( silent=True )
+    if (type(pairs) is not list) or (len(pairs) == 0) or (len(pairs) > MAX_BATCH):
+        site.logger.info(f"Asked to validate a malformed batch, ignoring." )
+        if not batch_throttle( 1 ):
+            return batch_busy()
+        return jsonify( error=f"Expected a list of 1 to {MAX_BATCH} [seed, ticket] pairs." ), 400
+
+    output = [{'status': 'invalid'} for _ in pairs]
+
+    # weed out anything malformed, with the same checks as validate(). JSON
+    #  adds numbers, but floats and bools must not be rounded into seeds.
+    index, seeds, tickets = list(), list(), list()
+    for i, pair in enumerate(pairs):
+        try:
+            seed, ticket = pair
+            if (type(seed) not in [str, int]) or (type(ticket) is not str):
+                continue
+
+            seed_b   = int(seed).to_bytes( 8, 'big', signed=True )
+            ticket_b = clean_ticket( ticket )
+        except:
+            continue
+
+        if len(ticket_b) in [16,32]:
+            index.append( i )
+            seeds.append( seed_b )
+            tickets.append( ticket_b )
+
+    # decrypt the survivors in one go, then group them by the category they name
+    by_cat = dict()
+    for i, results in zip( index, decrypt_tickets_batch(seeds, tickets, EXPANDED_KEY, SALT) ):
+        if results is not None:
+            seed_b, cat, time = results
+            by_cat.setdefault( cat, list() ).append( (i, seed_b, time) )
+
+    # check each category's seeds in one search, and finally the elapsed time
+    now_e = encode_time_ts( timestamp() )
+    for cat, entries in by_cat.items():
+
+        category = cat_map.get( cat )
+        if category is None:
+            continue
+
+        keys  = np.frombuffer( b''.join(seed_b for _, seed_b, _ in entries), dtype='>u8' ).astype( np.uint64 )
+        found = category.contains_many( keys )
+        for (i, seed_b, time), present in zip( entries, found ):
+            if not present:
+                continue
+
+            delta = (now_e - time)*TICK
+            if delta < LIVE_TIME:
+                output[i] = {'status': 'live', 'seed': int.from_bytes(seed_b, 'big', signed=True), \
+                        'name': category.name, 'time': int(LIVE_TIME - delta + .5)}
+
+            elif delta < DEAD_TIME:
+                dtime     = decode_time_ts( time ) + LIVE_TIME
+                output[i] = {'status': 'dead', 'seed': int.from_bytes(seed_b, 'big', signed=True), \
+                        'name': category.name, 'time': int(dtime - dtime % 60)}
+
+    valid = sum( 1 for entry in output if entry['status'] != 'invalid' )
+    site.logger.info(f"Validated a batch of {len(pairs)} tickets, {valid} of them live or dead." )
+
+    if not batch_throttle( len(pairs) ):
+        return batch_busy()
+    return jsonify( output )
+
+def batch_throttle(count: int) -> bool:
+    """Pay for count verifications, for validate_batch().
+
+    RETURN
+    ======
+    True if the throttle was paid, False if it's too backed up to queue.
+    """
+
+    try:
+        validator.verify_throttle( count )
+    except TimeoutError:
+        site.logger.warning(f"Validation throttle is backed up, turning away a batch of {count}." )
+        return False
+
+    return True
+
+def batch_busy():
+    """The response for a batch turned away by batch_throttle()."""
+
+    return jsonify( error="Too many validations are queued, try again later." ), 429
+
 # allow this to be run as a standalone app
 if __name__ == '__main__':
     site.run(host='0.0.0.0', port=8080)
@@ -3,10 +3,15 @@
 import argparse
 import gzip
 from io import BytesIO
+import numpy as np
+from os import close, replace, stat, unlink
+from os.path import dirname
 from sys import exit
+from tempfile import mkstemp
 
-def parse_seeds( file ):
-    """Parse the seed information from a file stream.
+def parse_header( file ):
+    """Parse the url and name from the start of a seed file stream, leaving
+       the stream positioned at the first seed.
 
     PARAMETERS
     ==========
@@ -14,11 +19,10 @@ def parse_seeds( file ):
 
     RETURN
     ======
-    A tuple of the form (url, name, seeds), where:
+    A tuple of the form (url, name), where:
        url is a string containing the url these seeds can be reached from,
-       name is a long-form description of these seeds,
-       and seeds is a bytes object containing the seeds. On failure, return
-       None.
+       and name is a long-form description of these seeds. On failure,
+       return None.
     """
     
     # format: url, name, seeds. url and name are preceeded by how long they are.
@@ -38,27 +42,165 @@ def parse_seeds( file ):
     except:
         return None
 
-    return (url, name, file.read())
+    return (url, name)
+
+def parse_seeds( file ):
+    """Parse the seed information from a file stream.
+
+    PARAMETERS
+    ==========
+    file: A file-like object to read from.
+
+    RETURN
+    ======
+    A tuple of the form (url, name, seeds), where:
+       url is a string containing the url these seeds can be reached from,
+       name is a long-form description of these seeds,
+       and seeds is a bytes object containing the seeds. On failure, return
+       None.
+    """
+
+    header = parse_header( file )
+    if header is None:
+        return None
+
+    return header + (file.read(),)
+
+def cache_file( filename ):
+    """Return the name of the cache file associated with a seed file."""
+
+    assert type(filename) is str
+
+    if filename[-3:] == '.gz':
+        filename = filename[:-3]
+    return filename + '.cache'
+
+def source_stamp( filename ):
+    """Identify the current version of a seed file, so a cache built from
+       an older version can be spotted.
+
+    PARAMETERS
+    ==========
+    filename: A string containing the seed file's name.
+
+    RETURN
+    ======
+    A numpy array of two uint64s, the file's size and modification time in
+       nanoseconds, or None if the file can't be examined.
+    """
+
+    assert type(filename) is str
+
+    try:
+        info = stat( filename )
+    except:
+        return None
+
+    return np.array( [info.st_size, info.st_mtime_ns], dtype=np.uint64 )
+
+def load_cache( filename, stamp ):
+    """Map in the cached, sorted seeds for a seed file, if they're current.
+
+    PARAMETERS
+    ==========
+    filename: A string containing the seed file's name, not the cache's.
+    stamp: The seed file's source_stamp().
+
+    RETURN
+    ======
+    A numpy array of sorted, native-endian uint64s backed by the cache
+       file, or None if there's no usable cache.
+    """
+
+    assert type(filename) is str
+
+    if stamp is None:
+        return None
+
+    try:
+        # copy-on-write keeps the array writable, which numba insists on, while
+        #  every process mapping the file shares the same clean pages
+        seeds = np.load( cache_file(filename), mmap_mode='c', allow_pickle=False )
+    except:
+        return None
+
+    if (seeds.dtype != np.uint64) or (seeds.ndim != 1) or (seeds.shape[0] < 2):
+        return None
+
+    # the cache leads with the stamp of the seed file it was built from. Any
+    #  difference means stale; a copied or extracted file can keep an older
+    #  modification time, so comparing which is newer isn't enough.
+    if (seeds[0] != stamp[0]) or (seeds[1] != stamp[1]):
+        return None
+
+    return seeds[2:]
+
+def save_cache( filename, seeds, stamp ):
+    """Write out sorted seeds so later loads of this seed file can map them
+       in instead of decompressing and sorting. Failure is silent, as the
+       cache is only an optimization.
+
+    PARAMETERS
+    ==========
+    filename: A string containing the seed file's name, not the cache's.
+    seeds: A numpy array of sorted, native-endian uint64s.
+    stamp: The seed file's source_stamp(), taken before it was read.
+    """
+
+    assert type(filename) is str
+
+    if stamp is None:
+        return
+
+    # write to a temporary file then rename, so no one maps a partial cache
+    try:
+        handle, temp = mkstemp( dir=dirname(filename) or '.' )
+        close( handle )
+    except:
+        return
+
+    try:
+        with open( temp, 'wb' ) as f:
+            np.save( f, np.concatenate((stamp, seeds)), allow_pickle=False )
+        replace( temp, cache_file(filename) )
+    except:
+        try:
+            unlink( temp )
+        except:
+            pass
 
-def load_seeds( filename, sort=True ):
+def load_seeds( filename, sort=True, array=False, cache=False ):
     """Load up the seeds contained in the given file. Optionally sorts them.
 
     PARAMETERS
     ==========
     filename: A string containing the obvious.
     sort: A boolean on whether or not to sort the seeds.
+    array: A boolean on whether to return the seeds as a numpy array.
+    cache: A boolean on whether to keep sorted seeds in a cache file beside
+       this one, which is mapped into memory on later loads. Only used if
+       sort and array are both True.
 
     RETURN
     ======
     A tuple of the form (url, name, seeds), where:
        url is a string containing the url these seeds can be reached from,
        name is a long-form description of these seeds,
-       and seeds is a bytes object containing the seeds. On failure, return
+       and seeds is a bytes object containing the seeds, or a numpy array
+       of native-endian uint64s if array is True. On failure, return
        None.
     """
 
     assert type(filename) is str
     assert type(sort) is bool
+    assert type(array) is bool
+    assert type(cache) is bool
+
+    cache = cache and sort and array
+
+    # identify the seed file before reading it, so a change mid-read can't
+    #  be mistaken for the version we cached
+    stamp = source_stamp( filename ) if cache else None
 
     try:
         if filename[-3:] == '.gz':
@@ -68,6 +210,14 @@ def load_seeds( filename, sort=True ):
     except:
         return None
 
+    # a current cache means we only need the header from the seed file
+    if cache:
+        seeds = load_cache( filename, stamp )
+        if seeds is not None:
+            header = parse_header( f )
+            f.close()
+            return None if header is None else header + (seeds,)
+
     output = parse_seeds( f )
     f.close()
 
@@ -75,14 +225,22 @@ def load_seeds( filename, sort=True ):
         return None
 
     url, name, seeds = output
+    if not (sort or array):
+        return url, name, seeds
+
+    # big-endian byte order matches unsigned order, so sorting native uint64s
+    #  in C gives the same result as sorting the raw 8-byte slices
+    values = np.frombuffer( seeds, dtype='>u8', count=len(seeds) >> 3 ).astype( np.uint64 )
     if sort:
+        values.sort()       # astype() made a copy, so this is safe in-place
+
+    if cache:
+        save_cache( filename, values, stamp )
 
-        array = [seeds[ i : i+8 ] for i in range(0, len(seeds), 8)]
-        array.sort()            # better to do this in-place than call sorted
-        seeds = b''.join( array )
-        del array
+    if array:
+        return url, name, values
 
-    return url, name, seeds
+    return url, name, values.astype( '>u8' ).tobytes()
 
 def read_TSVs( files, sort=True ):
     """Given a list of filenames, turn them into an array of seeds. Each seed is
@@ -91,7 +249,8 @@ def read_TSVs( files, sort=True ):
     PARAMETERS
     ==========
     files: A list of strings, representing files to read.
-    sort: Should the packed seeds be sorted?
+    sort: Should the packed seeds be sorted? Duplicate removal sorts them
+       regardless, so this is kept only for compatibility.
 
     RETURN
     ======
@@ -101,7 +260,7 @@ def read_TSVs( files, sort=True ):
     assert type(files) in [tuple, list]
     assert type(sort) is bool
 
-    seeds = set()
+    arrays = list()
     for filename in files:
         # open depending on gzip or bare
         try:
@@ -112,22 +271,39 @@ def read_TSVs( files, sort=True ):
         except:
             continue    # just move on if one fails
 
-        for line in f:
-            # read in seeds
-            try:
-                seed = int(line)
-            except:
-                continue
+        # let numpy's C parser handle the common case. Seeds are signed, so
+        #  read them that way and reinterpret as unsigned afterwards.
+        try:
+            arr = np.loadtxt( f, dtype=np.int64, ndmin=1 )
+            if arr.ndim != 1:
+                raise ValueError( f"'{filename}' has more than one column." )
+            arrays.append( arr.view(np.uint64) )
 
-            # convert to unsigned and pack
-            seed &= ((1 << 64) - 1)
-            seeds.add( seed.to_bytes(8, 'big') )
+        except ValueError:
 
-    temp = list(seeds)
-    if sort:
-        temp.sort()
+            # something odd in there, so fall back on a line-by-line read
+            f.seek( 0 )
+            temp = list()
+            for line in f:
+                # read in seeds
+                try:
+                    seed = int(line)
+                except:
+                    continue
 
-    return temp
+                # convert to unsigned
+                temp.append( seed & ((1 << 64) - 1) )
+
+            arrays.append( np.array(temp, dtype=np.uint64) )
+
+        f.close()
+
+    # unique() sorts as a side effect, so the seeds come back sorted whatever
+    #  the value of sort; that's cheap on native uint64s
+    seeds = np.unique( np.concatenate(arrays) ) if arrays else np.empty( 0, dtype=np.uint64 )
+
+    raw = seeds.astype( '>u8' ).tobytes()
+    return [raw[ i : i+8 ] for i in range(0, len(raw), 8)]
 
 def pack_seeds( url, name, seeds, sort=True ):
     """Create a seed file.
@@ -235,9 +411,4 @@ if __name__ == '__main__':
 
         seeds.sort()        # hasn't been sorted yet
         for seed in seeds:
-
-            value = int.from_bytes( seed, 'big' )
-            if value >= (1 << 63):
-                value -= (1 << 64)
-
-            print(value)
+            print( int.from_bytes(seed, 'big', signed=True) )
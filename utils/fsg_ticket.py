@@ -4,13 +4,31 @@ import argparse
 from binascii import unhexlify
 
 from cryptography.hazmat.backends import default_backend as backend
-from cryptography.hazmat.primitives import hashes, hmac, padding
+from cryptography.hazmat.primitives import hashes, hmac
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 
 from datetime import datetime, timedelta, timezone
 
+from functools import lru_cache
+from hashlib import sha256
+from hmac import compare_digest
+
+import numpy as np
+
 from secrets import randbits, token_bytes
+from struct import Struct
 from sys import exit
+from threading import local
+
+# resolve OpenSSL once at import; it dispatches to AES-NI/SHA-NI on its own
+BACKEND = backend()
+
+# a ticket's core: the seed, category, and time
+CORE = Struct( '>8sBI' )
+
+# the default epoch for ticket times, 2021/1/1 00:00:00 UTC
+EPOCH    = datetime( 2021, 1, 1, tzinfo=timezone.utc )
+EPOCH_TS = 1609459200
 
 def hash_bytes( input, key=None ):
     """Apply SHA2-256. Optionally use HMAC.
@@ -29,16 +47,156 @@ def hash_bytes( input, key=None ):
     assert (key is None) or type(key) is bytes
     assert (key is None) or ((len(key) >= 24) and (len(key) <= 64))
 
+    # hashlib is a single C call for plain hashes, but copying OpenSSL's keyed
+    #  state beats the stdlib's HMAC
     if key is None:
-        tagger = hashes.Hash( hashes.SHA256(), backend=backend() )
-    else:
-        tagger = hmac.HMAC( key, hashes.SHA256(), backend=backend() )
+        return sha256( input ).digest()
 
+    tagger = keyed_hmac( key ).copy()
     tagger.update( input )
-    tag = tagger.finalize()
-    del tagger
+    return tagger.finalize()
+
+@lru_cache( maxsize=8 )
+def keyed_hmac( key ):
+    """Create an HMAC-SHA2-256 context that has absorbed the key, but no
+       input. The server salt never changes, so copying this context
+       skips rehashing the padded key for every tag. Never update the
+       returned context itself, only copies of it.
+
+    PARAMETERS
+    ==========
+    key: A bytes object containing the key.
+
+    RETURN
+    ======
+    A cryptography HMAC object.
+    """
+
+    return hmac.HMAC( key, hashes.SHA256(), backend=BACKEND )
+
+def hash_bytes_batch( inputs, key=None ):
+    """Apply SHA2-256 to many inputs, optionally with HMAC. The key is
+       only processed once, and each input continues from a copy of
+       that state; otherwise identical to calling hash_bytes() on each.
+
+    PARAMETERS
+    ==========
+    inputs: A list of bytes objects to be tagged.
+    key: A bytes object containing the key, or None if no key is being
+       used.
+
+    RETURN
+    ======
+    A list of bytes objects, one per input.
+    """
+    assert type(inputs) in [tuple, list]
+    assert all( type(input) is bytes for input in inputs )
+    assert (key is None) or type(key) is bytes
+    assert (key is None) or ((len(key) >= 24) and (len(key) <= 64))
+
+    if key is None:
+        return [sha256( input ).digest() for input in inputs]
+
+    base = keyed_hmac( key )
+    output = list()
+    for input in inputs:
+        tagger = base.copy()
+        tagger.update( input )
+        output.append( tagger.finalize() )
+
+    return output
+
+class ExpandedKey:
+    """An AES key that has been checked and wrapped once, so the hot paths
+       can reuse it instead of preparing the key on every call."""
+
+    def __init__( self, key ):
+        """Create an ExpandedKey.
+
+        PARAMETERS
+        ==========
+        key: A bytes object containing the key.
+        """
+
+        assert type(key) is bytes
+        assert len(key) in [16, 24, 32]
+
+        self.key = key
+        self.aes = algorithms.AES( key )
+        self.backend = BACKEND
+        self.ecb = Cipher( self.aes, mode=modes.ECB(), backend=self.backend )
+        self.local = local()
+
+    def encrypt_ecb( self, input ):
+        """Encrypt whole blocks with AES in ECB mode. Each thread keeps one
+           encryption context open, so the key schedule is only computed once
+           per thread rather than once per call.
 
-    return tag
+        PARAMETERS
+        ==========
+        input: A bytes object, a multiple of 16 bytes long.
+
+        RETURN
+        ======
+        A bytes object.
+
+        RAISES
+        ======
+        ValueError if the input isn't a whole number of blocks.
+        """
+
+        # ECB never buffers whole blocks, but a partial one would linger in
+        #  this thread's context and garble every later call, even under -O
+        if (len(input) & 15) != 0:
+            raise ValueError( f"ECB input must be a multiple of 16 bytes, not {len(input)}." )
+
+        cypher = getattr( self.local, 'encryptor', None )
+        if cypher is None:
+            cypher = self.local.encryptor = self.ecb.encryptor()
+
+        return cypher.update( input )
+
+    def decrypt_ecb( self, input ):
+        """Decrypt whole blocks with AES in ECB mode. See encrypt_ecb().
+
+        PARAMETERS
+        ==========
+        input: A bytes object, a multiple of 16 bytes long.
+
+        RETURN
+        ======
+        A bytes object.
+
+        RAISES
+        ======
+        ValueError if the input isn't a whole number of blocks.
+        """
+
+        if (len(input) & 15) != 0:
+            raise ValueError( f"ECB input must be a multiple of 16 bytes, not {len(input)}." )
+
+        cypher = getattr( self.local, 'decryptor', None )
+        if cypher is None:
+            cypher = self.local.decryptor = self.ecb.decryptor()
+
+        return cypher.update( input )
+
+@lru_cache( maxsize=8 )
+def expand_key( key ):
+    """Prepare a key for repeated use by encrypt_bytes_ek() and friends.
+       Results are cached, so the functions that take a raw key don't
+       redo this on every call.
+
+    PARAMETERS
+    ==========
+    key: A bytes object containing the key.
+
+    RETURN
+    ======
+    An ExpandedKey object.
+    """
+
+    return ExpandedKey( key )
 
 def encrypt_bytes( input, key ):
     """Encrypt a byte sequence with AES. Length of key determines 
@@ -54,22 +212,38 @@ def encrypt_bytes( input, key ):
     A bytes object.
     """
 
-    assert type(input) is bytes
     assert type(key) is bytes
     assert len(key) in [16, 24, 32]
 
+    return encrypt_bytes_ek( input, expand_key(key) )
+
+def encrypt_bytes_ek( input, key ):
+    """Encrypt a byte sequence with AES, using a prepared key.
+
+    PARAMETERS
+    ==========
+    input: A bytes object to be encrypted and tagged.
+    key: An ExpandedKey object.
+
+    RETURN
+    ======
+    A bytes object.
+    """
+
+    assert type(input) is bytes
+    assert type(key) is ExpandedKey
+
     iv = token_bytes( 16 )  # AES always has block size 16
     tag = hash_bytes( input )
 
-    padder = padding.PKCS7( 128 ).padder()
-    padded = padder.update(input) + padder.update(tag) + \
-            padder.finalize()
+    # PKCS7 padding, which always adds between 1 and 16 bytes
+    pad_len = 16 - ((len(input) + len(tag)) & 15)
+    padded = input + tag + bytes((pad_len,)) * pad_len
 
-    cypher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=backend()).encryptor()
-    encrypt = iv + cypher.update(padded) + cypher.finalize()
-
-    del iv, tag, padder, padded, cypher # encourage GC
-    return encrypt
+    cypher = Cipher(key.aes, modes.CBC(iv), backend=key.backend).encryptor()
+    # we pad to whole blocks ourselves, so update() returns everything and
+    #  finalize() would only add an empty bytes object
+    return iv + cypher.update(padded)
 
 def decrypt_bytes( input, key ):
     """Decrypt a byte sequence with AES, if possible.
@@ -85,34 +259,54 @@ def decrypt_bytes( input, key ):
       Otherwise, return None.
     """
 
-    assert type(input) is bytes
     assert type(key) is bytes
     assert len(key) in [16, 24, 32]
 
-    if (len(input) % len(key)) != 0:    # only certain sizes are valid
+    return decrypt_bytes_ek( input, expand_key(key) )
+
+def decrypt_bytes_ek( input, key ):
+    """Decrypt a byte sequence with AES using a prepared key, if possible.
+
+    PARAMETERS
+    ==========
+    input: A bytes object to be decrypted and verified.
+    key: An ExpandedKey object.
+
+    RETURN
+    ======
+    If the input could be decrypted, return a bytes object.
+      Otherwise, return None.
+    """
+
+    assert type(input) is bytes
+    assert type(key) is ExpandedKey
+
+    if ((len(input) % 16) != 0) or (len(input) < 32):  # only an IV plus whole AES blocks is valid
         return None
 
-    iv = input[:16]
+    # views avoid copying the ciphertext and plaintext at every slice
+    view = memoryview( input )
+    iv = view[:16]
 
-    cypher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=backend()).decryptor()
-    padded = cypher.update(input[16:]) + cypher.finalize()
-    del iv, cypher      # encourage GC
+    cypher = Cipher(key.aes, modes.CBC(iv), backend=key.backend).decryptor()
+    padded = cypher.update(view[16:])     # whole blocks, so nothing is held back
 
-    padder = padding.PKCS7( 128 ).unpadder()
-    try:
-        tagged = padder.update(padded) + padder.finalize()
-    except:
-        del padder
+    # strip the PKCS7 padding, checking it in constant time
+    pad_len = padded[-1]
+    if (pad_len < 1) or (pad_len > 16) or \
+            not compare_digest( padded[-pad_len:], bytes((pad_len,)) * pad_len ):
         return None
-    
-    tag = hash_bytes( tagged[:-32] )
-    if tag != tagged[-32:]:
-        del tagged, tag
+
+    # what's left is the plaintext followed by its 32 byte tag
+    end = len(padded) - pad_len - 32
+    if end < 0:
         return None
 
-    else:
-        del tag
-        return tagged[:-32]
+    plain = memoryview( padded )[:end]
+    if not compare_digest( sha256( plain ).digest(), padded[end:end+32] ):
+        return None
+
+    return bytes( plain )
 
 def generate_ticket( seed, cat, time, salt, key, blocks=2 ):
     """Generate the ticket used to validate a run.
@@ -124,7 +318,7 @@ def generate_ticket( seed, cat, time, salt, key, blocks=2 ):
     time: The time the seed was drawn, in 1/8ths of a 
        second past epoch.
     salt: A bytes object containing this server's salt.
-    key: A bytes object containing the encryption key.
+    key: A bytes object containing the encryption key, or an ExpandedKey.
     blocks: How long the ticket is, in blocks of 16 bytes.
       Shorter tickets are easier to work with but also easier to
       forge. Only 1 and 2 are valid.
@@ -142,25 +336,128 @@ def generate_ticket( seed, cat, time, salt, key, blocks=2 ):
     assert (time >= 0) and (time <= 0xffffffff)
     assert type(salt) is bytes
     assert (len(salt) >= 24) and (len(salt) <= 64)
-    assert type(key) is bytes
-    assert len(key) in [16, 24, 32]
     assert blocks in [1,2]
 
+    if type(key) is not ExpandedKey:
+        key = expand_key( key )
+
+    # encrypt and return
+    return key.encrypt_ecb( build_raw_ticket(seed, cat, time, salt, blocks) )
+
+def generate_tickets_batch( seeds, cats, times, salt, key, blocks=2 ):
+    """Generate many tickets at once. All the tickets are encrypted by a
+       single AES call, so OpenSSL can pipeline the independent blocks;
+       otherwise this is identical to calling generate_ticket() on each.
+
+    PARAMETERS
+    ==========
+    seeds: A list of bytes objects representing the seeds.
+    cats: A list of ints representing the categories, in the same order
+       as seeds.
+    times: A list of ints representing the times, in the same order as
+       seeds. See generate_ticket().
+    salt: A bytes object containing this server's salt.
+    key: A bytes object containing the encryption key, or an ExpandedKey.
+    blocks: How long each ticket is, in blocks of 16 bytes.
+
+    RETURN
+    ======
+    A list of bytes objects, one ticket per seed.
+    """
+
+    assert type(seeds) in [tuple, list]
+    assert type(cats) in [tuple, list]
+    assert type(times) in [tuple, list]
+    assert len(seeds) == len(cats) == len(times)
+    assert all( (type(seed) is bytes) and (len(seed) == 8) for seed in seeds )
+    assert all( (type(cat) is int) and (cat >= 0) and (cat <= 255) for cat in cats )
+    assert all( (type(time) is int) and (time >= 0) and (time <= 0xffffffff) for time in times )
+    assert type(salt) is bytes
+    assert (len(salt) >= 24) and (len(salt) <= 64)
+    assert blocks in [1,2]
+
+    if type(key) is not ExpandedKey:
+        key = expand_key( key )
+
+    # build all the cores, then tag them together
+    cores = [CORE.pack( seed, cat, time ) for seed, cat, time in zip(seeds, cats, times)]
+    tags  = hash_bytes_batch( cores, salt )
+
+    length  = blocks*16
+    tickets = key.encrypt_ecb( b''.join( core + tag[: length - len(core) ] \
+            for core, tag in zip(cores, tags) ) )
+
+    return [tickets[ i : i+length ] for i in range(0, len(tickets), length)]
+
+def generate_tickets_array( seeds, cats, times, salt, key, blocks=2 ):
+    """Generate many tickets at once from numpy arrays. Cores, tags and
+       tickets are each assembled as one array rather than ticket by
+       ticket, making this the fastest way to mint tickets in bulk.
+       Otherwise identical to generate_tickets_batch().
+
+    PARAMETERS
+    ==========
+    seeds: A numpy array of uint8s with shape (N,8), one big-endian seed
+       per row.
+    cats: A numpy array of N uint8s, the categories.
+    times: A numpy array of N uint32s, the times. See generate_ticket().
+    salt: A bytes object containing this server's salt.
+    key: A bytes object containing the encryption key, or an ExpandedKey.
+    blocks: How long each ticket is, in blocks of 16 bytes.
+
+    RETURN
+    ======
+    A numpy array of uint8s with shape (N,blocks*16), one ticket per row.
+    """
+
+    assert (seeds.dtype == np.uint8) and (seeds.ndim == 2) and (seeds.shape[1] == 8)
+    assert (cats.dtype == np.uint8) and (cats.shape == seeds.shape[:1])
+    assert (times.dtype == np.uint32) and (times.shape == seeds.shape[:1])
+    assert type(salt) is bytes
+    assert (len(salt) >= 24) and (len(salt) <= 64)
+    assert blocks in [1,2]
+
+    if type(key) is not ExpandedKey:
+        key = expand_key( key )
+
+    count  = seeds.shape[0]
+    length = blocks*16
+
+    # the plaintext, with the cores in the first 13 columns
+    plain = np.empty( (count, length), dtype=np.uint8 )
+    plain[:, :8]   = seeds
+    plain[:, 8]    = cats
+    plain[:, 9:13] = times.astype( '>u4' ).view( np.uint8 ).reshape( count, 4 )
+
+    # hashing has to be done core by core, but the rest can stay in bulk
+    cores = plain[:, :13].tobytes()
+    tags  = hash_bytes_batch( [cores[ i : i+13 ] for i in range(0, len(cores), 13)], salt )
+    plain[:, 13:] = np.frombuffer( b''.join(tags), dtype=np.uint8 ).reshape( count, 32 )[:, :length-13]
+
+    tickets = key.encrypt_ecb( plain.tobytes() )
+    return np.frombuffer( tickets, dtype=np.uint8 ).reshape( count, length )
+
+def build_raw_ticket( seed, cat, time, salt, blocks=2 ):
+    """Assemble a ticket before encryption. A helper for generate_ticket()
+       and generate_tickets_batch().
+
+    PARAMETERS
+    ==========
+    See generate_ticket().
+
+    RETURN
+    ======
+    A bytes object, blocks*16 bytes long.
+    """
+
     # create the ticket's core
-    core = seed + cat.to_bytes( 1, 'big' ) + time.to_bytes( 4, 'big' )
+    core = CORE.pack( seed, cat, time )
 
     # create the associated tag
     tag = hash_bytes( core, salt )
 
     # combine them into the appropriate length
-    raw_ticket = core + tag[: blocks*16 - len(core) ]
-
-    # finally, encrypt and return
-    cypher = Cipher(algorithms.AES(key), mode=modes.ECB(), backend=backend()).encryptor()
-    ticket = cypher.update( raw_ticket ) + cypher.finalize()
-
-    del core, tag, raw_ticket, cypher
-    return ticket
+    return core + tag[: blocks*16 - len(core) ]
 
 def decrypt_ticket( seed, ticket, key, salt=None ):
     """Decrypt and validate the ticket. "Validate" means check
@@ -172,7 +469,7 @@ def decrypt_ticket( seed, ticket, key, salt=None ):
     ==========
     seed: A bytes object representing the seed.
     ticket: A bytes object of the ticket to validate.
-    key: A bytes object containing the encryption key.
+    key: A bytes object containing the encryption key, or an ExpandedKey.
     salt: A bytes object containing this server's salt, or None if it
        isn't known.
 
@@ -190,27 +487,93 @@ def decrypt_ticket( seed, ticket, key, salt=None ):
     assert len(ticket) in [16, 32]
     assert (salt is None) or (type(salt) is bytes)
     assert (salt is None) or ((len(salt) >= 24) and (len(salt) <= 64))
-    assert type(key) is bytes
-    assert len(key) in [16, 24, 32]
+
+    if type(key) is not ExpandedKey:
+        key = expand_key( key )
 
     # decrypt the ticket
-    cypher = Cipher(algorithms.AES(key), mode=modes.ECB(), backend=backend()).decryptor()
-    raw_ticket = cypher.update( ticket ) + cypher.finalize()
-    del cypher
+    return check_raw_ticket( seed, key.decrypt_ecb( ticket ), salt )
 
-    # check that the seeds match
-    if raw_ticket[:8] != seed:
-        return None
+def decrypt_tickets_batch( seeds, tickets, key, salt=None ):
+    """Decrypt and validate many tickets at once. All the tickets are
+       decrypted by a single AES call, so OpenSSL can pipeline the
+       independent blocks; otherwise this is identical to calling
+       decrypt_ticket() on each.
+
+    PARAMETERS
+    ==========
+    seeds: A list of bytes objects representing the seeds.
+    tickets: A list of bytes objects of the tickets to validate, in the
+       same order as seeds.
+    key: A bytes object containing the encryption key, or an ExpandedKey.
+    salt: A bytes object containing this server's salt, or None if it
+       isn't known.
+
+    RETURN
+    ======
+    A list with one entry per ticket, each what decrypt_ticket() would
+      return for that ticket.
+    """
+    assert type(seeds) in [tuple, list]
+    assert type(tickets) in [tuple, list]
+    assert len(seeds) == len(tickets)
+    assert all( (type(seed) is bytes) and (len(seed) == 8) for seed in seeds )
+    assert all( (type(ticket) is bytes) and (len(ticket) in [16, 32]) for ticket in tickets )
+    assert (salt is None) or (type(salt) is bytes)
+    assert (salt is None) or ((len(salt) >= 24) and (len(salt) <= 64))
+
+    if type(key) is not ExpandedKey:
+        key = expand_key( key )
+
+    decrypted = key.decrypt_ecb( b''.join(tickets) )
+
+    raw_tickets = list()
+    offset = 0
+    for ticket in tickets:
+        raw_tickets.append( decrypted[ offset:offset+len(ticket) ] )
+        offset += len(ticket)
+
+    # tag every core together, whether or not its seed matches
+    tags = [None] * len(raw_tickets)
+    if salt is not None:
+        tags = hash_bytes_batch( [raw[:13] for raw in raw_tickets], salt )
+
+    return [check_raw_ticket( seed, raw, salt, tag ) \
+            for seed, raw, tag in zip(seeds, raw_tickets, tags)]
+
+def check_raw_ticket( seed, raw_ticket, salt=None, tag=None ):
+    """Validate an already-decrypted ticket. A helper for decrypt_ticket()
+       and decrypt_tickets_batch().
+
+    PARAMETERS
+    ==========
+    seed: A bytes object representing the seed.
+    raw_ticket: A bytes object of the decrypted ticket.
+    salt: A bytes object containing this server's salt, or None if it
+       isn't known.
+    tag: The tag of this ticket's core if it's already been computed,
+       otherwise None.
+
+    RETURN
+    ======
+    See decrypt_ticket().
+    """
+
+    # check that the seeds match, and the pseudo-nonce (the "core" is 13
+    #  bytes long). Both checks always run, so the time taken doesn't reveal
+    #  which one failed.
+    seed_r, cat, time = CORE.unpack_from( raw_ticket )
+    valid = compare_digest( seed_r, seed )
 
-    # check the pseudo-nonce (the "core" is 13 bytes long)
     if salt is not None:
-        tag = hash_bytes( raw_ticket[:13], salt )
-        if tag[: len(ticket) - 13] != raw_ticket[13:]:
-            del tag
-            return None
+        if tag is None:
+            tag = hash_bytes( raw_ticket[:13], salt )
+        valid &= compare_digest( tag[: len(raw_ticket) - 13], raw_ticket[13:] )
 
-    return seed, raw_ticket[8], \
-        int.from_bytes( raw_ticket[9:13], 'big' )
+    if not valid:
+        return None
+
+    return seed, cat, time
 
 def pretty_ticket( ticket, version=1 ):
     """Make the ticket look more appealing to human eyes.
@@ -228,7 +591,8 @@ def pretty_ticket( ticket, version=1 ):
 
     assert version == 1
 
-    return (''.join( [f"{ticket[i*8:(i+1)*8].hex()}-" for i in range( len(ticket)>>3 )] ))[:-1]
+    # groups are counted from the right, which is fine for whole 8-byte groups
+    return ticket[: len(ticket) & ~7 ].hex( '-', 8 )
 
 def clean_ticket( ticket, version=1 ):
     """Make the ticket look more appealing to a computer.
@@ -248,16 +612,17 @@ def clean_ticket( ticket, version=1 ):
 
     assert version == 1
 
-    for i,c in enumerate(ticket):
-        if (i in [16,33,50]) != (c == '-'):
-            return b''
+    # dashes must be at these positions, if the ticket is long enough, and nowhere else
+    dashes = [i for i in (16,33,50) if i < len(ticket)]
+    if (ticket.count('-') != len(dashes)) or any( ticket[i] != '-' for i in dashes ):
+        return b''
 
     try:
         return unhexlify( ticket.replace("-","") )
     except:
         return b''
 
-def encode_time( moment, epoch=datetime(2021,1,1,tzinfo=timezone(timedelta(0))) ):
+def encode_time( moment, epoch=EPOCH ):
     """Convert the given moment into 1/8th of a second since the epoch.
 
     PARAMETERS
@@ -278,7 +643,7 @@ def encode_time( moment, epoch=datetime(2021,1,1,tzinfo=timezone(timedelta(0)))
     delta = moment - epoch
     return int( delta.total_seconds()*8 + .5 )
 
-def decode_time( moment, epoch=datetime(2021,1,1,tzinfo=timezone(timedelta(0))) ):
+def decode_time( moment, epoch=EPOCH ):
     """Convert the encoded time (1/8th of a second since epoch) into 
        a datetime object.
 
@@ -299,138 +664,209 @@ def decode_time( moment, epoch=datetime(2021,1,1,tzinfo=timezone(timedelta(0)))
 
     return epoch + timedelta( milliseconds=moment*125 )
 
-def unsigned_to_signed( integer, bits=64 ):
-    """A quick helper to do what the tin says.
+def encode_time_ts( moment, epoch=EPOCH_TS ):
+    """Convert the given POSIX timestamp into 1/8th of a second since the epoch.
+       Cheaper than encode_time(), as no datetime objects are involved.
 
     PARAMETERS
     ==========
-    integer: The integer to convert.
-    bits: How many bits this number requires. Defaults to 8 bytes.
+    moment: Seconds since 1970/1/1 00:00:00 UTC, as returned by time.time().
+    epoch: The epoch to use, also in seconds since 1970. Defaults to 2021/1/1
+       00:00:00 UTC.
 
     RETURN
     ======
-    A signed integer.
+    The appropriate integer.
     """
 
-    if integer < (1 << (bits-1)):
-        return integer
-    else:
-        return integer - (1 << bits)
-    
+    return int( (moment - epoch)*8 + .5 )
 
-if __name__ == '__main__':
+def encode_times_ts( moments, epoch=EPOCH_TS ):
+    """Convert many POSIX timestamps at once. See encode_time_ts().
 
-   cmdline = argparse.ArgumentParser(description='Generate or validate a FSG ticket. Primarily used for offline verification.')
+    PARAMETERS
+    ==========
+    moments: A numpy array of seconds since 1970/1/1 00:00:00 UTC.
+    epoch: The epoch to use, also in seconds since 1970.
 
-   cmdline.add_argument( '--seed', metavar='INT', type=int, default=404, help='The seed to generate/validate.' )
-   cmdline.add_argument( '--cat', metavar='INT', type=int, help='The category that seed falls into.' )
-   cmdline.add_argument( '--time', metavar='INT', type=int, help='The time that seed becomes valid, in 1/8ths of a second since January 1st, 2021. Leave blank to use the current time.' )
+    RETURN
+    ======
+    A numpy array of uint32s, suitable for generate_tickets_array().
+    """
 
-   cmdline.add_argument( '--key', metavar='FILE/HEX', required=True, help='The secret key associated with this ticket. Ideally a filename, but a hex-encoded string also works.' )
-   cmdline.add_argument( '--salt', metavar='FILE/HEX/STRING', help='The salt associated with this ticket. Optional for validation. Ideally a filename, but a hex-encoded string works, with a text string as a fallback.' )
+    return np.floor( (moments - epoch)*8 + .5 ).astype( np.uint32 )
 
-   cmdline.add_argument( '--live_time', metavar='INT', type=int, default=7200, help='The number of seconds a ticket remains "live" after creation.' )
-   cmdline.add_argument( '--dead_time', metavar='INT', type=int, default=14*86400, help='The number of seconds until a ticket transitions from "dead" to "invalid/expired".' )
+def decode_time_ts( moment, epoch=EPOCH_TS ):
+    """Convert the encoded time (1/8th of a second since epoch) into 
+       a POSIX timestamp.
 
-   cmdline.add_argument( '--ticket', metavar='HEX', help='The ticket to be validated.' )
-   cmdline.add_argument( '--blocks', metavar='SIZE', type=int, choices=[1,2], default=2, help='The number of blocks in the ticket. Only used for generation.' )
+    PARAMETERS
+    ==========
+    moment: The integer representing a time to convert.
+    epoch: The epoch to use, in seconds since 1970. Defaults to 2021/1/1
+       00:00:00 UTC.
 
-   args = cmdline.parse_args()
+    RETURN
+    ======
+    A float of seconds since 1970/1/1 00:00:00 UTC.
+    """
 
-    
-   # try to load that key, first as a file
-   binary = None
-   try:
-       with open( args.key, 'rb' ) as f:
-           binary = f.read()
-   except:
-       pass
-        
-   # did we read something?
-   if binary is not None:
-
-    # use the length to tell if its hex-encoded ...
-    if len(binary) in [48, 64]:
-        try:
-            args.key = unhexlify( binary.decode('utf-8') )
-        except:
-            binary = None
+    return epoch + moment*0.125
 
-    # ... or it is binary ...
-    elif len(binary) in [16, 24]:
-        args.key = binary
+def load_key( source ):
+    """Load an AES key, the same way the command line does. Lets other
+       code reuse a key file without shelling out to this script.
 
-    # ... otherwise, decide based on if it decodes
-    elif len(binary) == 32:
-        try:
-            binary = unhexlify( binary.decode('utf-8') )
-        except:
-            pass
+    PARAMETERS
+    ==========
+    source: A string, ideally a filename, but a hex-encoded key also works.
+
+    RETURN
+    ======
+    A bytes object 16, 24, or 32 bytes long, or None if no valid key
+      could be found.
+    """
 
-        args.key = binary
+    assert type(source) is str
 
-   # if none of the above works, the key might be a hex string
-   if (type(args.key) is str) and (len(args.key) in [32, 48, 64]):
-        try:
-            args.key = unhexlify( args.key )
-        except:
-            pass
+    # try to load that key, first as a file
+    key = source
+    binary = None
+    try:
+        with open( source, 'rb' ) as f:
+            binary = f.read()
+    except:
+        pass
 
-   # still no key? give up
-   if (type(args.key) is not bytes) or (len(args.key) not in [16, 24, 32]):
-       print("ERROR: An invalid key was given! It must be a file or hex string, and either 16, 24, or 32 bytes long.")
-       exit( 1 )
+    # did we read something?
+    if binary is not None:
 
-   # the salt's turn, if it was provided
-   if args.salt is not None:
-        binary = None
+        # use the length to tell if its hex-encoded ...
+        if len(binary) in [48, 64]:
+            try:
+                key = unhexlify( binary.decode('utf-8') )
+            except:
+                pass
+
+        # ... or it is binary ...
+        elif len(binary) in [16, 24]:
+            key = binary
+
+        # ... otherwise, decide based on if it decodes
+        elif len(binary) == 32:
+            try:
+                binary = unhexlify( binary.decode('utf-8') )
+            except:
+                pass
+
+            key = binary
+
+    # if none of the above works, the key might be a hex string
+    if (type(key) is str) and (len(key) in [32, 48, 64]):
         try:
-            with open( args.salt, 'rb' ) as f:
-                binary = f.read()
+            key = unhexlify( key )
         except:
             pass
-        
-        if binary is not None:
-
-            # check if the length reveals it was hex encoded ...
-            if (len(binary) > 64) and (len(binary) <= 128):
-                try:
-                    args.salt = unhexlify( binary.decode('utf-8') )
-                except:
-                    binary = None
-                    
-            # ... or it is raw bytes ...
-            elif (len(binary) >= 24) and (len(binary) < 48):
-                    args.salt = binary
-
-            # ... or on whether or not it decodes
-            elif (len(binary) >= 48) and (len(binary) <= 64):
-                try:
-                    binary = unhexlify( binary.decode('utf-8') )
-                except:
-                    pass
-
-                args.salt = binary
-                    
-        # if none of the above works, the salt might be a hex string
-        if (type(args.salt) is str) and \
-                (len(args.salt) >= 48) and (len(args.salt) <= 128):
+
+    if (type(key) is not bytes) or (len(key) not in [16, 24, 32]):
+        return None
+
+    return key
+
+def load_salt( source ):
+    """Load a salt, the same way the command line does. See load_key().
+
+    PARAMETERS
+    ==========
+    source: A string, ideally a filename, but a hex-encoded salt works,
+       with a text string as a fallback.
+
+    RETURN
+    ======
+    A bytes object between 24 and 64 bytes long, or None if no valid
+      salt could be found.
+    """
+
+    assert type(source) is str
+
+    salt = source
+    binary = None
+    try:
+        with open( source, 'rb' ) as f:
+            binary = f.read()
+    except:
+        pass
+
+    if binary is not None:
+
+        # check if the length reveals it was hex encoded ...
+        if (len(binary) > 64) and (len(binary) <= 128):
             try:
-                args.salt = unhexlify( args.salt )
+                salt = unhexlify( binary.decode('utf-8') )
             except:
                 pass
 
-        # still nothing? Maybe it's a string
-        if (type(args.salt) is str) and \
-                (len(args.salt) >= 24) and (len(args.salt) <= 64):
+        # ... or it is raw bytes ...
+        elif (len(binary) >= 24) and (len(binary) < 48):
+            salt = binary
+
+        # ... or on whether or not it decodes
+        elif (len(binary) >= 48) and (len(binary) <= 64):
             try:
-                args.salt = args.salt.encode('utf-8')
+                binary = unhexlify( binary.decode('utf-8') )
             except:
                 pass
 
-        # if we haven't succeeded by now, there must have been an error
-        if (type(args.salt) is not bytes) or \
-                (len(args.salt) < 24) or (len(args.salt) > 64):
+            salt = binary
+
+    # if none of the above works, the salt might be a hex string
+    if (type(salt) is str) and (len(salt) >= 48) and (len(salt) <= 128):
+        try:
+            salt = unhexlify( salt )
+        except:
+            pass
+
+    # still nothing? Maybe it's a string
+    if (type(salt) is str) and (len(salt) >= 24) and (len(salt) <= 64):
+        try:
+            salt = salt.encode('utf-8')
+        except:
+            pass
+
+    # if we haven't succeeded by now, there must have been an error
+    if (type(salt) is not bytes) or (len(salt) < 24) or (len(salt) > 64):
+        return None
+
+    return salt
+
+if __name__ == '__main__':
+
+   cmdline = argparse.ArgumentParser(description='Generate or validate a FSG ticket. Primarily used for offline verification.')
+
+   cmdline.add_argument( '--seed', metavar='INT', type=int, default=404, help='The seed to generate/validate.' )
+   cmdline.add_argument( '--cat', metavar='INT', type=int, help='The category that seed falls into.' )
+   cmdline.add_argument( '--time', metavar='INT', type=int, help='The time that seed becomes valid, in 1/8ths of a second since January 1st, 2021. Leave blank to use the current time.' )
+
+   cmdline.add_argument( '--key', metavar='FILE/HEX', required=True, help='The secret key associated with this ticket. Ideally a filename, but a hex-encoded string also works.' )
+   cmdline.add_argument( '--salt', metavar='FILE/HEX/STRING', help='The salt associated with this ticket. Optional for validation. Ideally a filename, but a hex-encoded string works, with a text string as a fallback.' )
+
+   cmdline.add_argument( '--live_time', metavar='INT', type=int, default=7200, help='The number of seconds a ticket remains "live" after creation.' )
+   cmdline.add_argument( '--dead_time', metavar='INT', type=int, default=14*86400, help='The number of seconds until a ticket transitions from "dead" to "invalid/expired".' )
+
+   cmdline.add_argument( '--ticket', metavar='HEX', help='The ticket to be validated.' )
+   cmdline.add_argument( '--blocks', metavar='SIZE', type=int, choices=[1,2], default=2, help='The number of blocks in the ticket. Only used for generation.' )
+
+   args = cmdline.parse_args()
+
+   # load the key and salt
+   args.key = load_key( args.key )
+   if args.key is None:
+       print("ERROR: An invalid key was given! It must be a file or hex string, and either 16, 24, or 32 bytes long.")
+       exit( 1 )
+
+   if args.salt is not None:
+        args.salt = load_salt( args.salt )
+        if args.salt is None:
             print("ERROR: An invalid salt was given! It must be a file or string, between 24 and 64 bytes in size.")
             exit( 2 )
 
@@ -439,9 +875,8 @@ if __name__ == '__main__':
         print("ERROR: An invalid seed was given! It should be smaller.")
         exit( 3 )
 
-   # convert the seed to unsigned bytes
-   args.seed &= ((1 << 64) - 1)
-   args.seed = args.seed.to_bytes( 8, 'big' )
+   # convert the seed to bytes
+   args.seed = args.seed.to_bytes( 8, 'big', signed=True )
 
    # fill in a time, if necessary
    if args.time is None:
@@ -496,7 +931,7 @@ if __name__ == '__main__':
             print(f" EXPIRES: In {remaining // 3600} hours, {(remaining // 60)%60} minutes, and {remaining % 60} seconds.")
 
        print(f"  TICKET: {pretty_ticket( args.ticket )}")
-       print(f"    SEED: {unsigned_to_signed(int.from_bytes( seed, 'big' ))}")
+       print(f"    SEED: {int.from_bytes( seed, 'big', signed=True )}")
        print(f"     CAT: {cat}")
        if args.salt is None:
            print(" WARNING: No value for the salt was provided, so this could be a forged ticket.")
@@ -513,6 +948,6 @@ if __name__ == '__main__':
         exit( 7 )
 
    ticket = pretty_ticket( generate_ticket( args.seed, args.cat, args.time, args.salt, args.key, args.blocks ) )
-   print(f"Here is a ticket for seed {unsigned_to_signed(int.from_bytes( args.seed, 'big' ))}:")
+   print(f"Here is a ticket for seed {int.from_bytes( args.seed, 'big', signed=True )}:")
    print(f" TICKET: {ticket}")
 
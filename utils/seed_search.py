@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+# Numba is optional; without it we fall back on numpy's binary search
+try:
+    from numba import boolean, njit, uint64
+except ImportError:
+    njit = None
+
+
+if njit is not None:
+
+    # an explicit signature means this is compiled at import, not on the first request.
+    #  The search touches no Python objects, so it can run without holding the GIL.
+    #  Every index is provably in range, so bounds checks stay off even if
+    #  NUMBA_BOUNDSCHECK is set in the environment.
+    @njit( boolean(uint64[::1], uint64), cache=True, fastmath=False, nogil=True, boundscheck=False )
+    def contains_seed( seeds, key ):
+        """Check if a seed is present in a sorted array of seeds.
+
+        PARAMETERS
+        ==========
+        seeds: A sorted, contiguous numpy array of native-endian uint64s.
+        key: The seed to look for, as an unsigned 64-bit int.
+
+        RETURN
+        ======
+        True if the seed is present, False otherwise.
+        """
+
+        n = seeds.shape[0]
+        if n == 0:
+            return False
+
+        # interpolation needs the key to be in range, and this rules out
+        #  plenty of misses for free
+        first, last = seeds[0], seeds[n-1]
+        if (key < first) or (key > last):
+            return False
+        if first == last:
+            return True
+
+        # seeds are close to uniform between the first and last, so guess where
+        #  the key should be. Floats are plenty accurate for a guess, and a
+        #  ratio between 0 and 1 keeps the guess in range.
+        est = np.int64( (np.float64(key - first) / np.float64(last - first)) * np.float64(n - 1) )
+
+        # gallop outwards from the guess until the key is bracketed. The first
+        #  few steps stay within a cache line or two of the guess.
+        step = 1
+        if seeds[est] <= key:
+            lo, hi = est, est + 1
+            while (hi < n) and (seeds[hi] <= key):
+                lo    = hi
+                hi   += step
+                step <<= 1
+            hi = min( hi, n )
+
+        else:
+            lo, hi = est - 1, est
+            while (lo > 0) and (seeds[lo] > key):
+                hi    = lo
+                lo   -= step
+                step <<= 1
+            lo = max( lo, 0 )
+
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            value = seeds[mid]
+            if value < key:
+                lo = mid + 1
+            elif value > key:
+                hi = mid
+            else:
+                return True
+
+        return False
+
+else:
+
+    def contains_seed( seeds, key ):
+        """Check if a seed is present in a sorted array of seeds.
+
+        PARAMETERS
+        ==========
+        seeds: A sorted, contiguous numpy array of native-endian uint64s.
+        key: The seed to look for, as an unsigned 64-bit int.
+
+        RETURN
+        ======
+        True if the seed is present, False otherwise.
+        """
+
+        key = np.uint64( key )
+        idx = int( np.searchsorted( seeds, key ) )
+        return (idx < seeds.shape[0]) and bool(seeds[idx] == key)
+
+
+def contains_seeds( seeds, keys ):
+    """Check which of many seeds are present in a sorted array of seeds. A
+       single vectorized search covers every key, which beats looking each
+       up separately once there are more than a handful.
+
+    PARAMETERS
+    ==========
+    seeds: A sorted, contiguous numpy array of native-endian uint64s.
+    keys: A numpy array of uint64s to look for.
+
+    RETURN
+    ======
+    A numpy array of bools, True where the key is present.
+    """
+
+    idx   = np.searchsorted( seeds, keys )
+    found = idx < seeds.shape[0]
+    found[found] = seeds[ idx[found] ] == keys[found]
+    return found